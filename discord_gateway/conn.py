@@ -1,10 +1,13 @@
 import time
 import zlib
 from collections import deque
+from contextlib import contextmanager
+from types import ModuleType
 from typing import (
-    Any, Deque, Dict, Generator, List, Optional, Tuple, Union
+    Any, Callable, ClassVar, Deque, Dict, FrozenSet, Generator, List, Optional,
+    Tuple, Type, Union
 )
-from urllib.parse import urlencode, urlsplit
+from urllib.parse import urlsplit
 
 from wsproto import ConnectionType, WSConnection
 from wsproto.connection import ConnectionState
@@ -26,6 +29,19 @@ except ImportError:
     # There is no fallback, we raise an exception later on.
     ERLPACK_AVAILABLE = False
 
+_zlib: ModuleType
+ISAL_ERRORS: Tuple[Type[Exception], ...]
+
+try:
+    # ISA-L ships a SIMD-accelerated drop-in replacement of the zlib module.
+    # Its error doesn't subclass zlib.error so it is converted where raised.
+    from isal import isal_zlib as _zlib
+    # The type stubs of ISA-L declare its error as an instance
+    ISAL_ERRORS = (_zlib.error,)  # type: ignore[assignment]
+except ImportError:
+    _zlib = zlib
+    ISAL_ERRORS = ()
+
 try:
     from orjson import dumps as orjson_dumps
     def json_dumps(obj: Any) -> str:
@@ -45,6 +61,18 @@ __all__ = ('DiscordConnection',)
 
 ZLIB_SUFFIX = b'\x00\x00\xff\xff'
 
+HEARTBEAT_JSON = '{"op":1,"d":%d}'
+HEARTBEAT_NULL_JSON = '{"op":1,"d":null}'
+
+# Accessing enum members is surprisingly slow, so the opcode compared against
+# for every event received is kept as a plain integer.
+DISPATCH_OP = int(Opcode.DISPATCH)
+
+CLOSING_STATES: FrozenSet[ConnectionState] = frozenset({
+    ConnectionState.CLOSED, ConnectionState.LOCAL_CLOSING,
+    ConnectionState.REMOTE_CLOSING
+})
+
 
 class DiscordConnection:
     """Main class representing a connection to Discord.
@@ -59,20 +87,40 @@ class DiscordConnection:
             If a boolean, indicates whether to use payload compression. On the
             other hand, if a string indicates the transport compression to use
             (can only be 'zlib-stream' at the moment).
+        query_params: Query parameters added to the URI when connecting.
         session_id: The session ID from Discord.
         sequence: Current sequence of events, used when resuming.
         acknowledged: Whether the last heartbeat was acknowledged.
         heartbeat_interval: Amount of seconds to sleep between heartbeats.
+        dropped_events:
+            How many events have been dropped because `max_events` events were
+            already waiting to be consumed.
     """
 
     _proto: WSConnection
+    _send: Callable[[Event], bytes]
+    _pending: Optional[List[bytes]]
+    _destination: Tuple[str, int]
+    _target: str
     _events: Deque[Dict[str, Any]]
+    _max_events: Optional[int]
     _attempts: int
 
-    _bytes_buffer: bytearray
-    _text_buffer: str
+    _bytes_parts: List[Union[bytes, bytearray]]
+    _text_parts: List[str]
+
+    _inflated: List[bytes]
+    _zlib_tail: bytes
 
-    _latency: Deque[float]
+    _dumps: Callable[[Any], Union[str, bytes]]
+    _loads: Callable[[Union[str, bytes]], Dict[str, Any]]
+    _message_type: Callable[[Any], Event]
+
+    _decode_text: Callable[[TextMessage], Optional[Dict[str, Any]]]
+    _decode_bytes: Callable[[BytesMessage], Optional[Dict[str, Any]]]
+
+    _latency: Deque[int]
+    _latency_sum: int
     _last_heartbeat: Optional[float]
 
     # This is actually a function that returns the underlying class, so we
@@ -82,7 +130,9 @@ class DiscordConnection:
     uri: str
     encoding: str
     compress: Union[str, bool]
+    query_params: str
     dispatch_handled: bool
+    dropped_events: int
 
     should_resume: Optional[bool]
     session_id: Optional[str]
@@ -95,8 +145,12 @@ class DiscordConnection:
     __slots__ = (
         'uri', 'encoding', 'compress', 'dispatch_handled', 'session_id',
         'sequence', '_events', 'should_resume', '_proto', 'acknowledged',
-        'heartbeat_interval', '_events', '_bytes_buffer', '_text_buffer',
-        '_inflator', '_attempts', '_last_heartbeat', '_latency', 'resume_uri',
+        'heartbeat_interval', '_bytes_parts', '_text_parts',
+        '_inflator', '_inflated', '_zlib_tail', '_attempts', '_last_heartbeat',
+        '_latency', '_latency_sum', 'resume_uri', 'query_params',
+        '_max_events', 'dropped_events', '_dumps', '_loads', '_message_type',
+        '_decode_text', '_decode_bytes', '_destination', '_target',
+        '_send', '_pending',
     )
 
     def __init__(
@@ -109,6 +163,7 @@ class DiscordConnection:
         sequence: Optional[int] = None,
         resume_uri: Optional[str] = None,
         dispatch_handled: bool = False,
+        max_events: Optional[int] = None,
     ) -> None:
         """Initialize a Discord Connection.
 
@@ -124,6 +179,8 @@ class DiscordConnection:
                 client cannot send compressed messages to the server.
                 Snowflakes are also transmitted as 64-bit integers as opposed
                 to strings. Either 'json' for JSON, or 'etf' for binary ETF.
+                ETF is decoded by 'erlpack' and skips JSON parsing entirely,
+                which is faster for high-traffic connections.
             compress:
                 Transport compression to use, this is different from payload
                 compression and both cannot be used at the same time. Payload
@@ -141,6 +198,16 @@ class DiscordConnection:
                 Whether to dispatch automatically handled events. Examples of
                 these types of events are HEARTBEAT_ACK and RECONNECT. When
                 this is set to False these events are not dispatched.
+            max_events:
+                The maximum amount of events to keep around until consumed by
+                `events()`. When this is reached the oldest event is dropped
+                and `dropped_events` is incremented. By default there's no
+                limit.
+
+        Raises:
+            ValueError:
+                ETF encoding is used without erlpack installed, or the hostname
+                could not be parsed out of the URI.
         """
         if encoding == 'etf' and not ERLPACK_AVAILABLE:
             raise ValueError("ETF encoding not available without 'erlpack' installed")
@@ -149,8 +216,28 @@ class DiscordConnection:
         self.encoding = encoding
         self.compress = compress
 
+        if encoding == 'json':
+            self._dumps, self._loads = json_dumps, json_loads
+            self._message_type = TextMessage
+        else:
+            # The encoding is ETF because these are only two cases
+            self._dumps, self._loads = etf_pack, etf_unpack
+            self._message_type = BytesMessage
+
+        # These only depend on the configuration above, so they are encoded
+        # once instead of every time we connect.
+        self.query_params = f'v=9&encoding={encoding}'
+        if compress == 'zlib-stream':
+            self.query_params += '&compress=zlib-stream'
+
+        self._select_decoders()
+
         self.dispatch_handled = dispatch_handled
 
+        self._max_events = max_events
+        self._pending = None
+        self.dropped_events = 0
+
         self.session_id = session_id
         self.sequence = sequence
 
@@ -162,28 +249,16 @@ class DiscordConnection:
         # This will initialize the rest of the attributes
         self.reconnect()
 
-    @property
-    def query_params(self) -> str:
-        """Query parameters to add to the URL depending on values chosen."""
-        quote = {'v': 9, 'encoding': self.encoding}
-        if self.compress == 'zlib-stream':
-            quote['compress'] = self.compress
-        return urlencode(quote)
-
     @property
     def destination(self) -> Tuple[str, int]:
-        """Generate a destination to connect to in the form of a tuple.
+        """The destination to connect to in the form of a tuple.
 
         The tuple has two items representing the host and port to open a TCP
-        socket to.
+        socket to. This is only updated by `reconnect()`, depending on
+        whether the connection should be resumed, so changes to
+        `should_resume` or `resume_uri` aren't reflected until then.
         """
-        uri = self.resume_uri if self.should_resume else self.uri
-        parsed = urlsplit(uri)
-
-        if parsed.hostname is None:
-            raise ValueError(f"Cannot parse hostname out of URI '{uri}'")
-
-        return parsed.hostname, parsed.port if parsed.port is not None else 443
+        return self._destination
 
     @property
     def closing(self) -> bool:
@@ -193,10 +268,7 @@ class DiscordConnection:
         is in progress. The best course of action is to simply skip sending
         the heartbeat and sleep another heartbeat interval.
         """
-        return self._proto.state in {
-            ConnectionState.CLOSED, ConnectionState.LOCAL_CLOSING,
-            ConnectionState.REMOTE_CLOSING
-        }
+        return self._proto.state in CLOSING_STATES
 
     @property
     def latency(self) -> float:
@@ -204,7 +276,8 @@ class DiscordConnection:
         if not self._latency:
             raise RuntimeError('Cannot calculate latency before receiving HEARTBEATs')
 
-        return sum(self._latency) / len(self._latency)
+        # The latencies are kept as integer nanoseconds
+        return self._latency_sum / len(self._latency) / 1e9
 
     def _encode(self, payload: Any) -> Event:
         """Prepare a payload to be sent to the gateway.
@@ -212,11 +285,7 @@ class DiscordConnection:
         This method will encode the payload in the configured encoding - either
         a JSON TextMessage Frame or ETF BytesMessage frame.
         """
-        if self.encoding == 'json':
-            return TextMessage(json_dumps(payload))
-        else:
-            # The encoding is ETF because these are only two cases
-            return BytesMessage(etf_pack(payload))
+        return self._message_type(self._dumps(payload))
 
     def reconnect(self) -> int:
         """Reinitialize the connection.
@@ -227,6 +296,13 @@ class DiscordConnection:
         The only thing not reset is the `should_resume` attribute which is
         set when disconnecting.
 
+        This is also where the URI to connect to is picked and parsed, so
+        changes to `should_resume` or `resume_uri` only take effect on the
+        next call to this method.
+
+        Raises:
+            ValueError: The hostname could not be parsed out of the URI.
+
         Returns:
             A duration to sleep, allowing for expotential backoff
             implementations to better handle Discord server downtimes.
@@ -236,19 +312,50 @@ class DiscordConnection:
         # when closing.
         # self.should_resume = None
 
+        # Parse the URI once per connection, both `destination` and
+        # `connect()` need it but the URI only changes between connections.
+        uri = self.resume_uri if self.should_resume else self.uri
+        parsed = urlsplit(uri)
+
+        if parsed.hostname is None:
+            raise ValueError(f"Cannot parse hostname out of URI '{uri}'")
+
+        self._destination = (
+            parsed.hostname, parsed.port if parsed.port is not None else 443
+        )
+
+        target = parsed.path or '/'
+
+        target += '?'
+        if parsed.query:
+            target += parsed.query + '&'
+
+        target += self.query_params
+
+        if parsed.fragment:
+            target += f'#{parsed.fragment}'
+
+        self._target = target
+
         self._proto = WSConnection(ConnectionType.CLIENT)
+        self._send = self._proto.send
 
         self.acknowledged = True
         self.heartbeat_interval = None
 
         self._latency = deque(maxlen=5)
+        self._latency_sum = 0
         self._last_heartbeat = None
 
-        self._events = deque()  # Buffer of events received
+        # Buffer of events received
+        self._events = deque(maxlen=self._max_events)
 
-        self._bytes_buffer = bytearray()
-        self._text_buffer = ''
-        self._inflator = zlib.decompressobj()
+        self._bytes_parts = []
+        self._text_parts = []
+        # Discord's zlib-stream is a zlib-wrapped stream with the full window
+        self._inflator = _zlib.decompressobj(_zlib.MAX_WBITS)
+        self._inflated = []
+        self._zlib_tail = b''
 
         # Normally an expotential backoff algorithm has +1 because if attempt
         # is 0 then the sleep duration should become 1. In this case though,
@@ -267,38 +374,55 @@ class DiscordConnection:
         and return, meaning that events are removed when retrieved so that no
         duplicates appear.
         """
-        while True:
-            try:
-                yield self._events.popleft()
-            except IndexError:
-                # There are no more events to consume
-                return
+        # This is intentionally kept lazy, consumers may stop iterating halfway
+        # through and expect the rest of the events to be kept.
+        while self._events:
+            yield self._events.popleft()
 
-    def connect(self) -> bytes:
-        """Generate the switching protocols bytes to convert to a WebSocket.
+    @contextmanager
+    def batch(self) -> Generator[List[bytes], None, None]:
+        """Collect the bytes of several commands to send them in one write.
 
-        The next step in the bootstrapping process is to continously receive
-        and send data until an HELLO event and the first HEARTBEAT command
-        has been sent.
+        While inside of the context manager, the gateway command methods
+        (`identify()`, `resume()`, `request_guild_members()`,
+        `update_voice_state()` and `update_presence()`) return an empty byte
+        string and instead append their data to the list yielded. Join the
+        list once exited and send it to the socket.
+
+        Everything else, such as `heartbeat()`, `close()` and the responses
+        returned by `receive()`, is unaffected and should be sent as usual.
+
+        Returns:
+            A context manager yielding the list that the bytes are added to.
         """
-        uri = self.resume_uri if self.should_resume else self.uri
-        parsed = urlsplit(uri)
+        pending: List[bytes] = []
 
-        if parsed.hostname is None:
-            raise ValueError(f"Cannot parse hostname out of URI '{uri}'")
+        previous = self._pending
+        self._pending = pending
+        try:
+            yield pending
+        finally:
+            self._pending = previous
 
-        target = parsed.path or '/'
+    def _send_command(self, event: Event) -> bytes:
+        """Send a gateway command, collecting it if inside of `batch()`."""
+        data = self._send(event)
+        if self._pending is None:
+            return data
 
-        target += '?'
-        if parsed.query:
-            target += parsed.query
+        self._pending.append(data)
+        return b''
 
-        target += self.query_params
+    def connect(self) -> bytes:
+        """Generate the switching protocols bytes to convert to a WebSocket.
 
-        if parsed.fragment:
-            target += f'#{parsed.fragment}'
+        The next step in the bootstrapping process is to continously receive
+        and send data until an HELLO event and the first HEARTBEAT command
+        has been sent.
 
-        return self._proto.send(Request(parsed.hostname, target))
+        The request targets the URI picked by the last call to `reconnect()`.
+        """
+        return self._send(Request(self._destination[0], self._target))
 
     def close(self, code: int = 1001) -> bytes:
         """Generate the bytes to send a closing frame to the WebSocket.
@@ -313,7 +437,7 @@ class DiscordConnection:
                 and 1001 (default) close the session which means when
                 reconnecting a new session has to be created using an IDENTIFY.
         """
-        return self._proto.send(CloseConnection(code))
+        return self._send(CloseConnection(code))
 
     def heartbeat(self, *, acknowledge: bool = True) -> bytes:
         """Generate a HEARTBEAT command to send.
@@ -336,16 +460,116 @@ class DiscordConnection:
                 # and attempt to reconnect with a RESUME. Here the 1008
                 # POLICY VIOLATION error code is used.
                 self.should_resume = True
-                return self._proto.send(CloseConnection(1008))
+                return self._send(CloseConnection(1008))
 
             self.acknowledged = False
 
         self._last_heartbeat = time.perf_counter()
-        return self._proto.send(self._encode({
+
+        if self.encoding == 'json':
+            # The HEARTBEAT payload has a fixed shape, so we can format it
+            # directly instead of building a dict and going through the
+            # JSON encoder every time.
+            if self.sequence is None:
+                return self._send(TextMessage(HEARTBEAT_NULL_JSON))
+            return self._send(TextMessage(HEARTBEAT_JSON % self.sequence))
+
+        return self._send(self._encode({
             'op': 1,
             'd': self.sequence,
         }))
 
+    def _on_ready(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # self.sequence was set in _handle_event()
+        data = event['d']
+        self.session_id = data['session_id']
+        self.resume_uri = data['resume_gateway_url']
+
+        self._attempts = 0  # Considered a successful attempt
+        return True, None
+
+    def _on_resumed(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        self._attempts = 0  # Considered a successful attempt
+        return True, None
+
+    # Dispatch events which update the state of the connection, all other
+    # events are simply passed on to the user.
+    _DISPATCH_HANDLERS: ClassVar[
+        Dict[str, Callable[..., Tuple[bool, Optional[bytes]]]]
+    ] = {
+        'READY': _on_ready,
+        'RESUMED': _on_resumed,
+    }
+
+    def _on_dispatch(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        handler = self._DISPATCH_HANDLERS.get(event['t'])
+        if handler is None:
+            return True, None
+
+        return handler(self, event)
+
+    def _on_heartbeat(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # Discord has sent a HEARTBEAT and expects an immediate response
+        return False, self.heartbeat(acknowledge=False)
+
+    def _on_heartbeat_ack(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # Acknowlegment of our heartbeat
+        self.acknowledged = True
+
+        # Doubt that there is a case where we get an HEARTBEAT_ACK without
+        # sending an HEARTBEAT, but
+        if self._last_heartbeat is not None:
+            # perf_counter_ns() is only available on Python 3.7+, so the
+            # delta is converted to integer nanoseconds instead.
+            latency = int((time.perf_counter() - self._last_heartbeat) * 1e9)
+            self._last_heartbeat = None
+
+            # Keep a running sum of the window so that reading the average
+            # does not need to iterate over it. Integers are used so that the
+            # sum does not drift from rounding errors.
+            if len(self._latency) == self._latency.maxlen:
+                self._latency_sum -= self._latency[0]
+            self._latency.append(latency)
+            self._latency_sum += latency
+
+        return False, None
+
+    def _on_hello(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # Discord sends the interval in milliseconds
+        self.heartbeat_interval = event['d']['heartbeat_interval'] / 1000
+        return True, None
+
+    def _on_reconnect(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # Discord wants us to reconnect and resume, because of how the
+        # WebSocket protocol works the server will respond with a
+        # CloseConnection message and we raise the CloseDiscordConnection
+        # exception there.
+        self.should_resume = True
+        # There really isn't a completely fitting error code here
+        return False, self._send(CloseConnection(1012))
+
+    def _on_invalid_session(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
+        # This is documented to be sent if:
+        # - The gateway could not initialize a session from an IDENTIFY
+        # - The gateway could not resume a session
+        # - The gateway has invalidated an active session
+        # The 'd' key indicates whether we should resume
+        self.should_resume = event['d']
+        return False, self._send(CloseConnection(1012))
+
+    # Handlers for the opcodes that need special treatment, looked up once per
+    # event instead of going through a chain of comparisons.
+    _OP_HANDLERS: ClassVar[
+        Dict[int, Callable[..., Tuple[bool, Optional[bytes]]]]
+    ] = {
+        Opcode.DISPATCH: _on_dispatch,
+        Opcode.HEARTBEAT: _on_heartbeat,
+        Opcode.HEARTBEAT_ACK: _on_heartbeat_ack,
+        Opcode.HELLO: _on_hello,
+        Opcode.RECONNECT: _on_reconnect,
+        Opcode.INVALID_SESSION: _on_invalid_session,
+    }
+
     def _handle_event(self, event: Dict[str, Any]) -> Tuple[bool, Optional[bytes]]:
         """Handle a Discord event and potentially send a response.
 
@@ -354,125 +578,220 @@ class DiscordConnection:
         item is a bool whether the event should be returned to the user and the
         second item is a potential response in bytes.
         """
-        if event.get('s') is not None:
-            self.sequence = event['s']
+        sequence = event.get('s')
+        if sequence is not None:
+            self.sequence = sequence
 
-        if event['op'] == Opcode.HEARTBEAT:
-            # Discord has sent a HEARTBEAT and expects an immediate response
-            return False, self.heartbeat(acknowledge=False)
+        handler = self._OP_HANDLERS.get(event['op'])
+        if handler is None:
+            return True, None
 
-        elif event['op'] == Opcode.HEARTBEAT_ACK:
-            # Acknowlegment of our heartbeat
-            self.acknowledged = True
+        return handler(self, event)
 
-            # Doubt that there is a case where we get an HEARTBEAT_ACK without
-            # sending an HEARTBEAT, but
-            if self._last_heartbeat is not None:
-                self._latency.append(time.perf_counter() - self._last_heartbeat)
-                self._last_heartbeat = None
+    def _select_decoders(self) -> None:
+        """Pick the methods used to decode messages depending on configuration.
 
-            return False, None
+        The encoding and compression used doesn't change between messages, so
+        instead of checking them for every frame received this is done once.
+        This needs to be called again whenever either of them change.
+        """
+        if self.encoding == 'etf':
+            self._decode_text = self._decode_unexpected_text
+        else:
+            self._decode_text = self._decode_json_text
 
-        elif event['op'] == Opcode.HELLO:
-            # Discord sends the interval in milliseconds
-            self.heartbeat_interval = event['d']['heartbeat_interval'] / 1000
-            return True, None
+        if self.compress == 'zlib-stream':
+            self._decode_bytes = self._decode_zlib_stream
+        elif self.compress is True:
+            self._decode_bytes = self._decode_compressed
+        elif self.encoding == 'etf':
+            self._decode_bytes = self._decode_etf
+        else:
+            self._decode_bytes = self._decode_unexpected_bytes
+
+    def _decode_json_text(self, event: TextMessage) -> Optional[Dict[str, Any]]:
+        # Compressed message will only show up as ByteMessage events,
+        # we can interpret this as a full JSON payload.
+        if not event.message_finished:
+            # Concatenating strings would copy everything received so far
+            # for each frame, join the fragments once instead.
+            self._text_parts.append(event.data)
+            return None
+
+        if not self._text_parts:
+            return self._loads(event.data)
+
+        self._text_parts.append(event.data)
+        data = ''.join(self._text_parts)
+        self._text_parts.clear()
+        return self._loads(data)
+
+    def _decode_unexpected_text(self, event: TextMessage) -> Optional[Dict[str, Any]]:
+        # ETF is a binary format and always arrives as BytesMessage events,
+        # there's no sensible way to decode text.
+        raise RuntimeError('Received text message when using ETF encoding')
+
+    def _decode_zlib_stream(self, event: BytesMessage) -> Optional[Dict[str, Any]]:
+        # Feed each frame to the decompressor as it arrives, this way we
+        # never hold on to the compressed data and only have to join the
+        # decompressed chunks once the message is complete. The zlib module
+        # releases the GIL while inflating, so other threads can run while
+        # large payloads such as READY or GUILD_CREATE are decompressed.
+        try:
+            self._inflated.append(self._inflator.decompress(event.data))
+        except ISAL_ERRORS as err:
+            raise zlib.error(*err.args) from err
+
+        if not event.message_finished:
+            # The ZLIB suffix may be split over several frames so we need
+            # to keep track of the last bytes of the compressed stream.
+            self._zlib_tail = (self._zlib_tail + event.data[-4:])[-4:]
+            return None
+
+        # endswith() compares the bytes in-place, we only need to look at
+        # earlier frames if this last one is too short to hold the suffix.
+        if len(event.data) >= 4:
+            complete = event.data.endswith(ZLIB_SUFFIX)
+        else:
+            complete = (self._zlib_tail + event.data).endswith(ZLIB_SUFFIX)
 
-        elif event['op'] == Opcode.DISPATCH and event['t'] == 'READY':
-            # self.sequence was set at the top of this method
-            self.session_id = event['d']['session_id']
-            self.resume_uri = event['d']['resume_gateway_url']
+        if not complete:
+            # The message is finished but our data doesn't end with the
+            # correct ZLIB suffix... there isn't really any sensible way
+            # to recover from this.
+            raise RuntimeError('Finished compressed message without ZLIB suffix')
 
-            self._attempts = 0  # Considered a successful attempt
-            return True, None
+        decompressed = b''.join(self._inflated)
+        self._inflated.clear()
+        self._zlib_tail = b''
 
-        elif event['op'] == Opcode.DISPATCH and event['t'] == 'RESUMED':
-            self._attempts = 0  # Considered a successful attempt
-            return True, None
+        return self._loads(decompressed)
 
-        elif event['op'] == Opcode.RECONNECT:
-            # Discord wants us to reconnect and resume, because of how the
-            # WebSocket protocol works the server will respond with a
-            # CloseConnection message and we raise the CloseDiscordConnection
-            # exception there.
-            self.should_resume = True
-            # There really isn't a completely fitting error code here
-            return False, self._proto.send(CloseConnection(1012))
-
-        elif event['op'] == Opcode.INVALID_SESSION:
-            # This is documented to be sent if:
-            # - The gateway could not initialize a session from an IDENTIFY
-            # - The gateway could not resume a session
-            # - The gateway has invalidated an active session
-            # The 'd' key indicates whether we should resume
-            self.should_resume = event['d']
-            return False, self._proto.send(CloseConnection(1012))
+    def _join_bytes(self, event: BytesMessage) -> Optional[bytes]:
+        # Keep the frames as-is and join them once, this way the data is
+        # only copied a single time however many frames there are.
+        self._bytes_parts.append(event.data)
 
-        return True, None
+        if not event.message_finished:
+            return None
 
-    def _receive_msg(self, event: Union[TextMessage, BytesMessage]) -> Optional[bytes]:
-        if isinstance(event, TextMessage):
-            # Compressed message will only show up as ByteMessage events,
-            # we can interpret this as a full JSON payload.
-            self._text_buffer += event.data
+        data = b''.join(self._bytes_parts)
+        self._bytes_parts.clear()
+        return data
 
-            if not event.message_finished:
-                return None
+    def _decode_compressed(self, event: BytesMessage) -> Optional[Dict[str, Any]]:
+        data = self._join_bytes(event)
+        if data is None:
+            return None
 
-            payload = json_loads(self._text_buffer)
-            self._text_buffer = ''
+        if data.endswith(ZLIB_SUFFIX):
+            try:
+                data = _zlib.decompress(data)
+            except ISAL_ERRORS as err:
+                raise zlib.error(*err.args) from err
+
+        return self._loads(data)
+
+    def _decode_etf(self, event: BytesMessage) -> Optional[Dict[str, Any]]:
+        data = self._join_bytes(event)
+        if data is None:
+            return None
+
+        return etf_unpack(data)
+
+    def _decode_unexpected_bytes(self, event: BytesMessage) -> Optional[Dict[str, Any]]:
+        raise RuntimeError('Received bytes message when no compression specified')
+
+    def _push_event(self, payload: Dict[str, Any]) -> None:
+        # A full deque silently drops its oldest item when appended to,
+        # so keep count of how many events were lost that way.
+        if len(self._events) == self._events.maxlen:
+            self.dropped_events += 1
+        self._events.append(payload)
+
+    def _receive_payload(self, payload: Dict[str, Any]) -> Optional[bytes]:
+        if payload['op'] == DISPATCH_OP and payload['t'] not in self._DISPATCH_HANDLERS:
+            # The vast majority of events are dispatches which we don't need
+            # to do anything with other than keep track of the sequence.
+            # Like in _handle_event(), a missing sequence must not overwrite
+            # the last one we received.
+            sequence = payload['s']
+            if sequence is not None:
+                self.sequence = sequence
+
+            self._push_event(payload)
+            return None
 
-        else:
-            self._bytes_buffer.extend(event.data)
+        dispatch, response = self._handle_event(payload)
 
-            if not event.message_finished:
-                return None
+        if self.dispatch_handled or dispatch:
+            self._push_event(payload)
 
-            if self.compress == 'zlib-stream':
-                if len(self._bytes_buffer) < 4 or self._bytes_buffer[-4:] != ZLIB_SUFFIX:
-                    # The message is finished but our data doesn't end with
-                    # the correct ZLIB suffix... there isn't really any
-                    # sensible way to recover from this.
-                    raise RuntimeError('Finished compressed message without ZLIB suffix')
+        return response
 
-                # The Zlib suffix has been sent and our buffer should be
-                # full with a complete message
-                if self.encoding == 'json':
-                    payload = json_loads(self._inflator.decompress(self._bytes_buffer))
-                else:
-                    payload: Dict[str, Any] = etf_unpack(
-                        self._inflator.decompress(bytes(self._bytes_buffer))
-                    )
+    def _receive_text(self, event: TextMessage) -> Optional[bytes]:
+        payload = self._decode_text(event)
+        if payload is None:
+            return None
 
-                self._bytes_buffer = bytearray()  # Reset our buffer
+        return self._receive_payload(payload)
 
-            elif self.compress is True:
-                if len(self._bytes_buffer) > 4 and self._bytes_buffer[-4:] == ZLIB_SUFFIX:
-                    decompressed = zlib.decompress(self._bytes_buffer)
-                else:
-                    decompressed = bytes(self._bytes_buffer)
+    def _receive_bytes(self, event: BytesMessage) -> Optional[bytes]:
+        payload = self._decode_bytes(event)
+        if payload is None:
+            return None
 
-                if self.encoding == 'json':
-                    payload = json_loads(decompressed)
-                else:
-                    payload: Dict[str, Any] = etf_unpack(decompressed)
+        return self._receive_payload(payload)
 
-                self._bytes_buffer = bytearray()
+    def _receive_ping(self, event: Ping) -> Optional[bytes]:
+        return self._send(event.response())
 
-            elif self.encoding == 'etf':
-                payload: Dict[str, Any] = etf_unpack(bytes(self._bytes_buffer))
+    def _receive_reject(self, event: RejectConnection) -> Optional[bytes]:
+        raise ConnectionRejected(event)
 
-                self._bytes_buffer = bytearray()
+    def _receive_reject_data(self, event: RejectData) -> Optional[bytes]:
+        self._bytes_parts.append(event.data)
 
-            else:
-                raise RuntimeError('Received bytes message when no compression specified')
+        if event.body_finished:
+            data = b''.join(self._bytes_parts)
+            # Even though we should not be receiving more data, it's
+            # best to clean up and make sure we have a correct state.
+            self._bytes_parts.clear()
 
-        dispatch, response = self._handle_event(payload)
+            raise RejectedConnectionData(data)
 
-        if self.dispatch_handled or dispatch:
-            self._events.append(payload)
+        return None
 
-        return response
+    def _receive_close(self, event: CloseConnection) -> Optional[bytes]:
+        # This may or may not have been initiated by us, either way the
+        # best option is to close the websocket and RESUME
+        if self.should_resume is None:
+            # This wasn't initiated by us, the best bet is to RESUME
+            self.should_resume = True
+
+        if self._proto.state is ConnectionState.CLOSED:
+            # We initiated the closing and have now received a reply,
+            # WSProto yields a CloseConnection to the initiatior (us)
+            raise CloseDiscordConnection(None)
+        else:
+            # It should be ConnectionState.REMOTE_CLOSING and we need
+            # to reply to the closure
+            raise CloseDiscordConnection(
+                self._send(event.response()),
+                code=event.code,
+                reason=event.reason,
+            )
+
+    _EVENT_HANDLERS: ClassVar[
+        Dict[Type[Event], Callable[..., Optional[bytes]]]
+    ] = {
+        Ping: _receive_ping,
+        RejectConnection: _receive_reject,
+        RejectData: _receive_reject_data,
+        CloseConnection: _receive_close,
+        TextMessage: _receive_text,
+        BytesMessage: _receive_bytes,
+    }
 
     def receive(self, data: Optional[bytes]) -> List[bytes]:
         """Receive data from the WebSocket.
@@ -485,15 +804,19 @@ class DiscordConnection:
             data: The bytes received from the TCP socket.
 
         Raises:
-            RuntimeError: Compressed event received with no compression.
+            RuntimeError:
+                Compressed event received with no compression, or a text
+                event was received when using ETF encoding.
+            zlib.error: Compressed data received could not be decompressed.
             ConnectionRejected:
                 Discord rejected the connection, continue receiving data to
                 receive the body from the HTTP response.
             RejectedConnectionData: The whole HTTP response has been received.
 
         Returns:
-            A list of bytes to respond back with. See `events()` for how to
-            get the events received.
+            A list of bytes to respond back with, these can be joined together
+            to send them with a single write to the socket. See `events()` for
+            how to get the events received.
         """
         # WSProto uses None instead of an empty byte string.
         if data is not None and len(data) == 0:
@@ -503,48 +826,20 @@ class DiscordConnection:
 
         res: List[bytes] = []
 
+        # Bind these to locals as they are looked up for every event
+        get_handler = self._EVENT_HANDLERS.get
+        append = res.append
+
         for event in self._proto.events():
-            if isinstance(event, Ping):
-                res.append(self._proto.send(event.response()))
-
-            elif isinstance(event, RejectConnection):
-                raise ConnectionRejected(event)
-
-            elif isinstance(event, RejectData):
-                self._bytes_buffer.extend(event.data)
-
-                if event.body_finished:
-                    data = bytes(self._bytes_buffer)
-                    # Even though we should not be receiving more data, it's
-                    # best to clean up and make sure we have a correct state.
-                    self._bytes_buffer.clear()
-
-                    raise RejectedConnectionData(data)
-
-            elif isinstance(event, CloseConnection):
-                # This may or may not have been initiated by us, either way the
-                # best option is to close the websocket and RESUME
-                if self.should_resume is None:
-                    # This wasn't initiated by us, the best bet is to RESUME
-                    self.should_resume = True
-
-                if self._proto.state == ConnectionState.CLOSED:
-                    # We initiated the closing and have now received a reply,
-                    # WSProto yields a CloseConnection to the initiatior (us)
-                    raise CloseDiscordConnection(None)
-                else:
-                    # It should be ConnectionState.REMOTE_CLOSING and we need
-                    # to reply to the closure
-                    raise CloseDiscordConnection(
-                        self._proto.send(event.response()),
-                        code=event.code,
-                        reason=event.reason,
-                    )
-
-            elif isinstance(event, (TextMessage, BytesMessage)):
-                response = self._receive_msg(event)
-                if response is not None:
-                    res.append(response)
+            # WSProto never subclasses its events, so we can look up the
+            # handler by the exact type instead of an isinstance() chain.
+            handler = get_handler(type(event))
+            if handler is None:
+                continue
+
+            response = handler(self, event)
+            if response is not None:
+                append(response)
 
         return res
 
@@ -587,6 +882,7 @@ class DiscordConnection:
         if compress is not None:
             data['compress'] = compress
             self.compress = compress
+            self._select_decoders()
 
         if large_threshold is not None:
             data['large_threshold'] = large_threshold
@@ -597,7 +893,7 @@ class DiscordConnection:
         if presence is not None:
             data['presence'] = presence
 
-        return self._proto.send(self._encode({
+        return self._send_command(self._encode({
             'op': Opcode.IDENTIFY,
             'd': data
         }))
@@ -613,7 +909,7 @@ class DiscordConnection:
         """
         self.should_resume = None
 
-        return self._proto.send(self._encode({
+        return self._send_command(self._encode({
             'op': Opcode.RESUME,
             'd': {
                 'token': token,
@@ -669,7 +965,7 @@ class DiscordConnection:
         if nonce is not None:
             data['nonce'] = nonce
 
-        return self._proto.send(self._encode({
+        return self._send_command(self._encode({
             'op': Opcode.REQUEST_GUILD_MEMBERS,
             'd': data
         }))
@@ -693,7 +989,7 @@ class DiscordConnection:
         Returns:
             The bytes to send to the TCP socket.
         """
-        return self._proto.send(self._encode({
+        return self._send_command(self._encode({
             'op': Opcode.VOICE_STATE_UPDATE,
             'd': {
                 'guild_id': guild,
@@ -722,7 +1018,7 @@ class DiscordConnection:
         Returns:
             The bytes to send to the TCP socket.
         """
-        return self._proto.send(self._encode({
+        return self._send_command(self._encode({
             'op': Opcode.PRESENCE_UPDATE,
             'd': {
                 'since': since,
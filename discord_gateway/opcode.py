@@ -53,12 +53,18 @@ RECONNECT_CLOSE_CODE = {
     CloseCode.DISALLOWED_INTENTS: False,
 }
 
+# The close codes that should not be reconnected after, as plain integers so
+# that checking a code doesn't need to construct the enum.
+NO_RECONNECT_CLOSE_CODES = frozenset(
+    int(code) for code, reconnect in RECONNECT_CLOSE_CODE.items() if not reconnect
+)
+
 
 def should_reconnect(code: Union[int, CloseCode, None]) -> bool:
     """Utility function to determine if the connection should be reconnected.
 
-    This function looks up the given code in a dictionary of known codes and
-    recommendations for whether or not to reconnect.
+    This function looks up the given code in a set of known codes that
+    should not be reconnected after.
 
     The implementation of this function is designed to be conservative in
     returning False, this means that when True is returned it may still not be
@@ -76,15 +82,7 @@ def should_reconnect(code: Union[int, CloseCode, None]) -> bool:
     if code is None:
         return True
 
-    # For regular WebSocket close-codes, we can just assume we want to
-    # reconnect as usual. This includes other unknown close codes such as those
-    # in the 3000-3999 range.
-    if 4000 > code > 5000:
-        return True
-
-    try:
-        code = CloseCode(code)
-    except ValueError:
-        return True
-
-    return RECONNECT_CLOSE_CODE.get(code, True)
+    # Regular WebSocket close-codes and other unknown close codes, such as
+    # those in the 3000-3999 range, are never part of the set so we reconnect
+    # as usual for them.
+    return code not in NO_RECONNECT_CLOSE_CODES